@@ -13,9 +13,20 @@ __all__ = [
     'escapefgcolor',
     'escapebgcolor',
     'ColoredSetting',
+    'Style',
+    'asstyle',
+    'colorize_many',
+    'colorize_cycle',
+    'strip_ansi',
+    'visible_width',
+    'style_cache_info',
+    'style_cache_clear',
+    'color_depth',
+    'set_color_depth',
+    'colorescapes',
 ]
 
-import sys, enum, abc, collections
+import sys, os, collections.abc, functools, itertools
 from utils import joiniterable
 from utils import streamistty
 from utils import joiniterable
@@ -41,38 +52,180 @@ _bgcolors.update(dict(zip(
         ( 'grey', 'light red', 'light green', 'light yellow', 'light blue', 'light magenta', 'light cyan', 'white', ),
         ( str(_) for _ in range(100, 108)))))
 
+# Besides the names above, fgcolor and bgcolor take a 256-color palette index or an (r, g, b) tuple. These
+# are written as-is on truecolor terminals and reduced to the 256 or 16 color palette elsewhere.
+_truecolor = 1 << 24
+_color_depths = ( 16, 256, _truecolor, )
+_color_depth = None
+
+def _detect_color_depth():
+    if os.environ.get('COLORTERM', '') in ( 'truecolor', '24bit', ):
+        return _truecolor
+    if '256' in os.environ.get('TERM', ''):
+        return 256
+    return 16
+
+def color_depth():
+    global _color_depth
+    if _color_depth == None:
+        _color_depth = _detect_color_depth()
+    return _color_depth
+
+# One of 16, 256 and 1 << 24 (truecolor); None detects it again from COLORTERM and TERM.
+def set_color_depth(depth = None):
+    global _color_depth
+    if depth != None and depth not in _color_depths:
+        raise ValueError('color depth must be one of 16, 256 and 16777216')
+    _color_depth = depth
+    style_cache_clear()
+    _index_escapes.clear()
+
+# RGB of the xterm palette: 16 system colors, the 6x6x6 cube and 24 shades of grey.
+_cube_levels = ( 0, 95, 135, 175, 215, 255, )
+_system_rgbs = ( (0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0), (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+                 (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0), (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255), )
+_palette_rgbs = _system_rgbs + tuple((r, g, b) for r in _cube_levels for g in _cube_levels for b in _cube_levels) + tuple((8 + 10 * _, ) * 3 for _ in range(24))
+
+_distance = lambda x, y: (x[0] - y[0]) ** 2 + (x[1] - y[1]) ** 2 + (x[2] - y[2]) ** 2
+
+# Lookup tables built on first use: the nearest 256-color index of every cell of a 32x32x32 RGB cube,
+# and the nearest system color of every 256-color index.
+_rgb_to_256 = None
+_256_to_16 = None
+
+def _build_color_tables():
+    global _rgb_to_256, _256_to_16
+    nearest_level = [ min(range(6), key = lambda i: abs(_cube_levels[i] - v)) for v in range(256) ]
+    nearest_grey = [ min(range(24), key = lambda i: abs(8 + 10 * i - v)) for v in range(256) ]
+    table = bytearray(1 << 15)
+    for r in range(32):
+        for g in range(32):
+            for b in range(32):
+                rgb = (r << 3 | 4, g << 3 | 4, b << 3 | 4)
+                cube = 16 + 36 * nearest_level[rgb[0]] + 6 * nearest_level[rgb[1]] + nearest_level[rgb[2]]
+                grey = 232 + nearest_grey[sum(rgb) // 3]
+                table[r << 10 | g << 5 | b] = min(cube, grey, key = lambda i: _distance(_palette_rgbs[i], rgb))
+    _256_to_16 = bytes(min(range(16), key = lambda i: _distance(_system_rgbs[i], _)) for _ in _palette_rgbs)
+    _rgb_to_256 = bytes(table)
+
+def _system_color_code(index, background):
+    return str((40 if background else 30) + index if index < 8 else (100 if background else 90) + index - 8)
+
+def _color_code(color, names, background):
+    if isinstance(color, str):
+        return names[color]
+    depth = color_depth()
+    if isinstance(color, int):
+        if not 0 <= color < 256:
+            raise ValueError('256-color index must be in range(256)')
+        index = color
+    else:
+        r, g, b = color
+        if not (0 <= r < 256 and 0 <= g < 256 and 0 <= b < 256):
+            raise ValueError('rgb components must be in range(256)')
+        if depth == _truecolor:
+            return '%d;2;%d;%d;%d' % (48 if background else 38, r, g, b)
+        if _rgb_to_256 == None:
+            _build_color_tables()
+        index = _rgb_to_256[r >> 3 << 10 | g >> 3 << 5 | b >> 3]
+    if depth == 16:
+        if _256_to_16 == None:
+            _build_color_tables()
+        return _system_color_code(_256_to_16[index], background)
+    return '%d;5;%d' % (48 if background else 38, index)
+
+# Escapes of the 256 palette indexes for each (depth, background), made on first use.
+_index_escapes = {}
+
+def _escapes_of_indexes(depth, background):
+    key = (depth, background)
+    if key not in _index_escapes:
+        names = _bgcolors if background else _fgcolors
+        _index_escapes[key] = [ _esc(_color_code(_, names, background)) for _ in range(256) ]
+    return _index_escapes[key]
+
+# Escape sequences of a whole column of colors (names, 256-color indexes or rgb tuples) in one pass. Below
+# truecolor the escape of each palette index is made once per color depth and rgb tuples only go through
+# the lookup table.
+def colorescapes(colors, background = False):
+    names = _bgcolors if background else _fgcolors
+    depth = color_depth()
+    if depth != _truecolor:
+        if _rgb_to_256 == None:
+            _build_color_tables()
+        table = _rgb_to_256
+        escapes_of_indexes = _escapes_of_indexes(depth, background)
+    else:
+        rgb_format = '\033[%d;2;%%d;%%d;%%dm' % (48 if background else 38)
+    memo = {}
+    escapes = []
+    for color in colors:
+        if type(color) is tuple:
+            r, g, b = color
+            if (r | g | b) >> 8:
+                raise ValueError('rgb components must be in range(256)')
+            if depth == _truecolor:
+                escapes.append(rgb_format % color)
+            else:
+                escapes.append(escapes_of_indexes[table[r >> 3 << 10 | g >> 3 << 5 | b >> 3]])
+            continue
+        if type(color) is list:
+            color = tuple(color)
+        escape = memo.get(color)
+        if escape == None:
+            escape = memo[color] = _esc(_color_code(color, names, background))
+        escapes.append(escape)
+    return escapes
+
 def _esc(codes):
     if isinstance(codes, (int, str)):
         return '\033[{}m'.format(codes)
-    elif isinstance(codes, collections.Iterable):
+    elif isinstance(codes, collections.abc.Iterable):
         return '\033[{}m'.format(joiniterable(';', codes))
     else:
         raise TypeError('must be one of int, str, iterable' + ', not ' + type(codes).__name__)
 
+_style_cache_size = 256
+
 def colorizeansi(*args, enabling = True, **style):
-    argstring = joiniterable(' ', args)
-    if enabling:
+    argstring = args[0] if len(args) == 1 and type(args[0]) is str else joiniterable(' ', args)
+    if enabling and style:
         paint = combineansi(**style)
         if paint:
-            argstring = paint + argstring + escapereset.NORMAL.value
+            argstring = paint + argstring + _reset_normal
     return argstring
 
 def ttyautocolorizeansi(stream, *args, **style):
     return colorizeansi(*args, enabling = streamistty(stream), **style)
 
+# Styles are compiled to their escape sequence once and kept in a bounded LRU cache keyed by the style
+# items. Unhashable values such as a list given as set are turned into tuples first.
 def combineansi(**style):
+    key = tuple(style.items())
+    try:
+        return _compile_style(key)
+    except TypeError:
+        return _compile_style(tuple((k, v if isinstance(v, collections.abc.Hashable) else tuple(v)) for k, v in key))
+
+@functools.lru_cache(maxsize = _style_cache_size)
+def _compile_style(key):
+    l = _style_codes(key)
+    return _esc(l) if l else ''
+
+def _style_codes(items):
     fields = {
         'set' :     lambda x: [ _sets[_] for _ in x ],
         'reset' :   lambda x: [ _resets[_] for _ in x ],
-        'fgcolor' : lambda x: [ _fgcolors[x] ],
-        'bgcolor' : lambda x: [ _bgcolors[x] ],
+        'fgcolor' : lambda x: [ _color_code(x, _fgcolors, False) ],
+        'bgcolor' : lambda x: [ _color_code(x, _bgcolors, True) ],
+        'style' :   lambda x: list(x.codes()),
     }
     l = []
-    for k, v in style.items():
+    for k, v in items:
         f = fields.get(k)
         if f:
             l.extend(f(v))
-    return _esc(l) if l else ''
+    return l
 
 def colorize(*args, enabling = True, **style):
     return colorizeansi(*args, enabling = enabling, **style)
@@ -83,11 +236,144 @@ def ttyautocolorize(stream, *args, **style):
 def combine(**style):
     return combineansi(**style)
 
-escapeset = enum.Enum('escapeset', { '_'.join(k.upper().split(' ')): _esc(v) for k, v in _sets.items() })
-escapereset = enum.Enum('escapereset', { '_'.join(k.upper().split(' ')): _esc(v) for k, v in _resets.items() })
-escapefgcolor = enum.Enum('escapefgcolor', { '_'.join(k.upper().split(' ')): _esc(v) for k, v in _fgcolors.items() })
-escapebgcolor = enum.Enum('escapebgcolor', { '_'.join(k.upper().split(' ')): _esc(v) for k, v in _bgcolors.items() })
+# Hits, misses, maxsize and currsize of the compiled style cache.
+def style_cache_info():
+    return _compile_style.cache_info()
+
+def style_cache_clear():
+    _compile_style.cache_clear()
+
+_escape_enums = { 'escapeset' : _sets, 'escapereset' : _resets, 'escapefgcolor' : _fgcolors, 'escapebgcolor' : _bgcolors, }
+
+# The escape enums are only built on first access, which keeps enum out of the import time of everything
+# using colored; once built they are ordinary module globals.
+def __getattr__(name):
+    if name not in _escape_enums:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    import enum
+    globals()[name] = enum.Enum(name, { '_'.join(k.upper().split(' ')): _esc(v) for k, v in _escape_enums[name].items() })
+    return globals()[name]
+
+_reset_normal = _esc(_resets['normal'])
+
+# A style compiled once, e.g. at import, and applied with a single concatenation:
+#   warn = Style(fgcolor = 'yellow', set = ( 'bold', ))
+#   print(warn('careful'), (warn | Style(set = ( 'underlined', )))('really careful'))
+# Anything taking style kwargs takes a Style as style = ..., e.g. colorize('careful', style = warn).
+class Style():
+    __slots__ = ( '__codes', '__prefix', '__reset', )
+
+    def __init__(self, **style):
+        self.__set_codes(_style_codes(style.items()))
+
+    def __set_codes(self, codes):
+        self.__codes = tuple(codes)
+        self.__prefix = _esc(self.__codes) if self.__codes else ''
+        self.__reset = _reset_normal if self.__codes else ''
 
+    def __call__(self, *args, enabling = True):
+        argstring = args[0] if len(args) == 1 and type(args[0]) is str else joiniterable(' ', args)
+        return self.__prefix + argstring + self.__reset if enabling else argstring
+
+    # Codes of the right-hand style come last and win where the two disagree.
+    def __or__(self, other):
+        style = Style.__new__(Style)
+        style.__set_codes(self.__codes + asstyle(other).__codes)
+        return style
+
+    def codes(self):
+        return self.__codes
+
+    def prefix(self):
+        return self.__prefix
+
+    def reset(self):
+        return self.__reset
+
+    def __eq__(self, other):
+        return isinstance(other, Style) and self.__codes == other.__codes
+
+    def __hash__(self):
+        return hash(self.__codes)
+
+    def __bool__(self):
+        return bool(self.__codes)
+
+    def __repr__(self):
+        return 'Style(%r)' % (self.__prefix, )
+
+# Accepts a Style or a dict of style kwargs.
+def asstyle(paint):
+    if isinstance(paint, Style):
+        return paint
+    return Style(**(paint or {}))
+
+# Bulk colorizing. The style is resolved and enabling checked once per batch. The painted strings are
+# returned as a list, or, if a stream is given, written to it with one write, each followed by end.
+def colorize_many(strings, style, enabling = True, stream = None, end = '\n'):
+    style = asstyle(style)
+    prefix, reset = (style.prefix(), style.reset()) if enabling else ('', '')
+    if stream == None:
+        return [ prefix + _ + reset for _ in map(str, strings) ]
+    strings = list(map(str, strings))
+    if strings:
+        stream.write(prefix + (reset + end + prefix).join(strings) + reset + end)
+
+# Like colorize_many, with the styles of palette applied round robin.
+def colorize_cycle(strings, palette, enabling = True, stream = None, end = '\n'):
+    palette = [ asstyle(_) for _ in palette ] or [ Style() ]
+    paints = [ (_.prefix(), _.reset()) if enabling else ('', '') for _ in palette ]
+    if stream == None:
+        return [ prefix + _ + reset for _, (prefix, reset) in zip(map(str, strings), itertools.cycle(paints)) ]
+    paints = [ (prefix, reset + end) for prefix, reset in paints ]
+    stream.write(''.join([ prefix + _ + suffix for _, (prefix, suffix) in zip(map(str, strings), itertools.cycle(paints)) ]))
+
+# CSI sequences such as colors and cursor movement, OSC sequences and the two-character escapes; compiled
+# on first use so that importing colored does not import re.
+@functools.lru_cache(maxsize = None)
+def _ansi_escape():
+    import re
+    return re.compile(r'\033(?:\[[0-?]*[ -/]*[@-~]|\][^\007\033]*(?:\007|\033\\)|[@-Z\\-_])')
+
+def strip_ansi(s):
+    if '\033' not in s:
+        return s
+    return _ansi_escape().sub('', s)
+
+# Terminal columns taken by a code point, worked out on first sight: wide and fullwidth East Asian
+# characters take two, combining marks and format characters none.
+class _CharWidths(dict):
+    def __missing__(self, char):
+        import unicodedata
+        if unicodedata.combining(char) or unicodedata.category(char) in ( 'Mn', 'Me', 'Cf', ):
+            width = 0
+        elif unicodedata.east_asian_width(char) in ( 'W', 'F', ):
+            width = 2
+        else:
+            width = 1
+        self[char] = width
+        return width
+
+_char_widths = _CharWidths()
+
+# Terminal columns taken by s once its escape sequences are left out.
+def visible_width(s):
+    if '\033' in s:
+        s = _ansi_escape().sub('', s)
+    if s.isascii():
+        return len(s)
+    return sum(map(_char_widths.__getitem__, s))
+
+# File descriptor behind a stream, None when it has none or has been closed.
+def _streamfd(stream):
+    try:
+        return stream.fileno()
+    except (AttributeError, ValueError, OSError):
+        return None
+
+# In auto mode the decision is cached per file descriptor, so a tty is asked once instead of once per line;
+# refresh() forgets the cached decisions after a descriptor has been reopened or redirected, and
+# set_colorize() injects a decision for a stream.
 class ColoredSetting(metaclass = Singleton):
     def __init__(self, when = 'auto', autocb = streamistty):
         if when == 'always':
@@ -96,8 +382,34 @@ class ColoredSetting(metaclass = Singleton):
             self.__has_enabled_colorize = False
         else:
             self.__has_enabled_colorize = autocb
+        self.__decisions = {}
+        self.__injected = {}
+
     def is_colorize(self, stream):
-        return self.__has_enabled_colorize if isinstance(self.__has_enabled_colorize, bool) else self.__has_enabled_colorize(stream)
+        if isinstance(self.__has_enabled_colorize, bool):
+            return self.__has_enabled_colorize
+        fd = _streamfd(stream)
+        key = stream if fd == None else fd
+        decision = self.__decisions.get(key)
+        if decision == None:
+            decision = self.__injected.get(key)
+            if decision == None:
+                decision = self.__has_enabled_colorize(stream)
+            if fd != None:
+                self.__decisions[fd] = decision
+        return decision
+
+    def set_colorize(self, stream, enabled):
+        fd = _streamfd(stream)
+        self.__injected[stream if fd == None else fd] = enabled
+        self.__decisions.pop(stream if fd == None else fd, None)
+
+    def refresh(self, stream = None):
+        if stream == None:
+            self.__decisions.clear()
+        else:
+            fd = _streamfd(stream)
+            self.__decisions.pop(stream if fd == None else fd, None)
 
 def main(argv = None):
     if argv is None:
@@ -112,11 +424,22 @@ def main(argv = None):
     print(c2 + '世界')
     print('世界' + c2)
     assert c2 == _esc([30, 46, 1, 9]) + '2. hello world 你好' + _esc(0)
+    assert strip_ansi(c2) == '2. hello world 你好'
+    assert visible_width(c2) == len('2. hello world ') + 4
 
     escseq = combine(fgcolor = 'green', bgcolor = 'silver', set = [ 'bold', 'underlined', 'blink' ])
     print(repr(escseq))
     assert len(escseq) == len(_esc([32, 47, 1, 4, 5]))
 
+    c3 = Style(fgcolor = 'black', bgcolor = 'cyan') | Style(set = [ 'bold', 'crossed out' ])
+    assert c3('2.', 'hello', 'world', '你好') == c2
+    assert colorize('2.', 'hello', 'world', '你好', style = c3) == c2
+
+    for depth in ( 16, 256, 1 << 24, ):
+        set_color_depth(depth)
+        print(''.join([ _ + ' ' for _ in colorescapes([ (255 * i // 39, 64, 255 - 255 * i // 39) for i in range(40) ], background = True) ]) + _esc(0))
+    set_color_depth()
+
     palette_paints = ( { 'fgcolor' : 'red', 'set' : ( 'bold', ) },
                        { 'fgcolor' : 'green', 'set' : ( 'bold', ) },
                        { 'fgcolor' : 'yellow', 'set' : ( 'bold', ) },
@@ -139,5 +462,10 @@ def main(argv = None):
     for l in "".join([d.get(c, c) for c in s]).splitlines():
         print(colorize(l, **next(paletteiter)))
 
+    lines = "".join([d.get(c, c) for c in s]).splitlines()
+    assert colorize_cycle(lines, palette_paints) == [ colorize(l, **p) for l, p in zip(lines, itertools.cycle(palette_paints)) ]
+    colorize_cycle(lines[:3], palette_paints, stream = sys.stdout)
+    colorize_many(lines[:3], palette_paints[0], stream = sys.stdout)
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -6,13 +6,14 @@ __all__ = [
 ]
 
 import sys, argparse
-from colored import colorize
+from colored import Style
+from colored import asstyle
 from colored import ColoredSetting
 
 class ColoredArgParser(argparse.ArgumentParser):
-    __styles = { 'usage' : { 'fgcolor' : 'yellow', 'set' : ( 'bold', ) },
-                 'help' :  { 'fgcolor' : 'blue', 'set' : ( 'bold', ) },
-                 'error' : { 'fgcolor' : 'red', 'set' : ( 'bold', ) }, }
+    __styles = { 'usage' : Style(fgcolor = 'yellow', set = ( 'bold', )),
+                 'help' :  Style(fgcolor = 'blue', set = ( 'bold', )),
+                 'error' : Style(fgcolor = 'red', set = ( 'bold', )), }
 
     def __init__(self, **kwargs):
         styles = kwargs.pop('styles', None)
@@ -23,16 +24,16 @@ class ColoredArgParser(argparse.ArgumentParser):
     def print_usage(self, file = sys.stdout):
         usage = self.format_usage()
         usage = usage[0].upper() + usage[1:]
-        self._print_message(colorize(usage, enabling = ColoredSetting().is_colorize(file), **self.__styles['usage']), file)
+        self._print_message(asstyle(self.__styles['usage'])(usage, enabling = ColoredSetting().is_colorize(file)), file)
 
     def print_help(self, file = sys.stdout):
         help = self.format_help()
         help = help[0].upper() + help[1:]
-        self._print_message(colorize(help, enabling = ColoredSetting().is_colorize(file), **self.__styles['help']), file)
+        self._print_message(asstyle(self.__styles['help'])(help, enabling = ColoredSetting().is_colorize(file)), file)
 
     def exit(self, status = 0, message = None):
         if message:
-            self._print_message(colorize(message, enabling = ColoredSetting().is_colorize(sys.stderr), **self.__styles['error']), sys.stderr)
+            self._print_message(asstyle(self.__styles['error'])(message, enabling = ColoredSetting().is_colorize(sys.stderr)), sys.stderr)
         sys.exit(status)
 
     def error(self, message):
@@ -42,7 +43,7 @@ class ColoredArgParser(argparse.ArgumentParser):
 
     def print_error(self, message):
         message = '%(prog)s: ERROR: %(message)s\n' % { 'prog': self.prog, 'message': message }
-        self._print_message(colorize(message, enabling = ColoredSetting().is_colorize(sys.stderr), **self.__styles['error']), sys.stderr)
+        self._print_message(asstyle(self.__styles['error'])(message, enabling = ColoredSetting().is_colorize(sys.stderr)), sys.stderr)
 
 def main(argv = None):
     if argv is None:
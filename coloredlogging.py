@@ -4,17 +4,37 @@
 __all__ = [
     'ColoredFormatter',
     'ColoredLogger',
+    'QueuedColoredHandler',
+    'BufferedColoredHandler',
+    'ColoredLogListener',
+    'RateLimitFilter',
     'init_colored_logger',
+    'init_colored_worker',
+    'flush_colored_loggers',
 ]
 
-import sys, logging
-from colored import colorize
+import sys, copy, time, atexit, weakref, threading, queue, logging, logging.handlers
+from colored import Style
 from colored import ColoredSetting
 
-_levelstyles = { 'INFO' :     { 'fgcolor' : 'green', 'set' : ( 'bold', ) },
-                 'WARNING':   { 'fgcolor' : 'yellow', 'set' : ( 'bold', ) },
-                 'ERROR' :    { 'fgcolor' : 'red', 'set' : ( 'bold', ) },
-                 'CRITICAL' : { 'fgcolor' : 'light red', 'set' : ( 'bold', ) }, }
+_levelstyles = { 'INFO' :     Style(fgcolor = 'green', set = ( 'bold', )),
+                 'WARNING':   Style(fgcolor = 'yellow', set = ( 'bold', )),
+                 'ERROR' :    Style(fgcolor = 'red', set = ( 'bold', )),
+                 'CRITICAL' : Style(fgcolor = 'light red', set = ( 'bold', )), }
+_nostyle = Style()
+
+# The format string of each level name with the escape prefix and suffix of the level built in, so painting
+# a record costs nothing on top of formatting it; names given by logging.addLevelName() later on are
+# picked up on first sight.
+class _LevelFormats(dict):
+    def __init__(self, fmt):
+        super().__init__()
+        self.__fmt = fmt
+
+    def __missing__(self, levelname):
+        style = _levelstyles.get(levelname, _nostyle)
+        self[levelname] = logging.PercentStyle(style.prefix() + self.__fmt + style.reset())
+        return self[levelname]
 
 _default_format = '%(filename)s: %(levelname)s: %(message)s'
 _default_dateformat = '%Y-%m-%d %H:%M:%S %p'
@@ -27,19 +47,363 @@ class ColoredFormatter(logging.Formatter):
         super().__init__(_default_format if fmt is None else fmt,
             _default_dateformat if datefmt is None else datefmt)
         self.__stream = stream
+        self.__is_colorize = None
+        self.__level_formats = _LevelFormats(self._style._fmt)
 
-    def format(self, record):
-        msg = super().format(record)
-        return str(colorize(msg, enabling = ColoredSetting().is_colorize(self.__stream), **_levelstyles.get(record.levelname, {})))
+    # Only the message line is painted, any traceback logging.Formatter appends to it is not. The setting
+    # is bound on the first record rather than here, so ColoredSetting(when) calls made after the
+    # formatter is built still take effect.
+    def formatMessage(self, record):
+        if self.__is_colorize == None:
+            self.__is_colorize = ColoredSetting().is_colorize
+        if not self.__is_colorize(self.__stream):
+            return self._style.format(record)
+        return self.__level_formats[record.levelname].format(record)
 
-class ColoredLogger(logging.Logger):
-    def __init__(self, name, level = logging.NOTSET, stream = sys.stderr):
-        super().__init__(name, level)
+_queue_overflows = ( 'block', 'drop-oldest', 'drop-new', )
+_default_queue_size = 10000
+
+# Stops by waiting for room in a full queue rather than failing on it.
+class _ColoredQueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+# Hands records over to a writer thread which formats, paints and writes them, so a slow stream no longer
+# stalls the logging threads. When the bounded queue is full, overflow decides whether to wait for room
+# or to drop the oldest queued or the new record; dropped counts the records lost.
+class QueuedColoredHandler(logging.handlers.QueueHandler):
+    def __init__(self, stream = sys.stderr, maxsize = _default_queue_size, overflow = 'block'):
+        if overflow not in _queue_overflows:
+            raise ValueError('overflow must be one of %s' % ', '.join(map(repr, _queue_overflows)))
+        super().__init__(queue.Queue(maxsize))
+        self.__overflow = overflow
+        self.__drop_lock = threading.Lock()
+        self.__closed = False
+        self.dropped = 0
+        self.__stream = stream
         self.__stream_handler = logging.StreamHandler(stream)
         self.__stream_handler.setFormatter(ColoredFormatter(stream = stream))
+        self.__listener = _ColoredQueueListener(self.queue, self.__stream_handler)
+        self.__listener.start()
+
+    # The message is merged here so that later changes to its arguments do not show, formatting and
+    # painting are left to the writer thread. The record is copied as other handlers see it too.
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    # Once closed there is no writer thread left, records still coming are written right away.
+    def enqueue(self, record):
+        if self.__closed:
+            self.__stream_handler.handle(record)
+            return
+        if self.__overflow == 'block':
+            self.queue.put(record)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                if self.__overflow == 'drop-new':
+                    self.__count_drop()
+                    return
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                continue
+            self.queue.task_done()
+            self.__count_drop()
+
+    def __count_drop(self):
+        with self.__drop_lock:
+            self.dropped += 1
+
+    # Waits until the records queued so far are written, for at most timeout seconds if given. It polls
+    # instead of joining the queue, so it cannot deadlock when called from a signal handler that
+    # interrupted a thread holding the queue lock.
+    def flush(self, timeout = None):
+        deadline = None if timeout == None else time.monotonic() + timeout
+        while not self.__closed and self.queue.unfinished_tasks:
+            if deadline != None and time.monotonic() >= deadline:
+                break
+            time.sleep(0.001)
+
+    # Called by logging.shutdown() at exit as well: the writer thread drains the queue before it stops.
+    # Loggers made afterwards get a new handler for the stream.
+    def close(self):
+        if not self.__closed:
+            self.__listener.stop()
+            self.__closed = True
+            if _queued_handlers.get(self.__stream) is self:
+                del _queued_handlers[self.__stream]
+        super().close()
+
+_default_buffer_capacity = 65536
+_default_buffer_interval = 0.2
+
+# Collects the painted lines and writes them with one write() once capacity characters are buffered or
+# interval seconds after the first of them, whichever comes first; a record at flushlevel or above is
+# written at once, together with everything buffered before it.
+class BufferedColoredHandler(logging.StreamHandler):
+    def __init__(self,
+        stream = sys.stderr,
+        capacity = _default_buffer_capacity,
+        interval = _default_buffer_interval,
+        flushlevel = logging.ERROR):
+        super().__init__(stream)
+        self.setFormatter(ColoredFormatter(stream = stream))
+        self.__capacity = capacity
+        self.__interval = interval
+        self.__flushlevel = flushlevel
+        self.__lines = []
+        self.__size = 0
+        self.__timer = None
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + self.terminator
+            self.__lines.append(line)
+            self.__size += len(line)
+            if record.levelno >= self.__flushlevel or self.__size >= self.__capacity:
+                self.flush()
+            elif self.__timer == None:
+                self.__timer = threading.Timer(self.__interval, self.flush)
+                self.__timer.daemon = True
+                self.__timer.start()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.__timer != None:
+                self.__timer.cancel()
+                self.__timer = None
+            if self.__lines:
+                lines = ''.join(self.__lines)
+                self.__lines.clear()
+                self.__size = 0
+                self.stream.write(lines)
+            super().flush()
+        finally:
+            self.release()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            super().close()
+
+_default_worker_batch = 256
+
+# Sends the records of a child process to the ColoredLogListener of its parent, a list of them per put().
+# The message is merged and the traceback rendered here so the records pickle, the painting is left to
+# the parent. A batch goes out once it is full, interval seconds after its first record, at ERROR and
+# above, and when the process exits.
+class _ColoredWorkerHandler(logging.handlers.QueueHandler):
+    def __init__(self, queue, batch = _default_worker_batch, interval = _default_buffer_interval):
+        super().__init__(queue)
+        self.__batch = batch
+        self.__interval = interval
+        self.__records = []
+        self.__timer = None
+
+    def enqueue(self, record):
+        self.__records.append(record)
+        if len(self.__records) >= self.__batch or record.levelno >= logging.ERROR:
+            self.flush()
+        elif self.__timer == None:
+            self.__timer = threading.Timer(self.__interval, self.flush)
+            self.__timer.daemon = True
+            self.__timer.start()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.__timer != None:
+                self.__timer.cancel()
+                self.__timer = None
+            if self.__records:
+                records, self.__records = self.__records, []
+                self.queue.put(records)
+        finally:
+            self.release()
+
+# Takes the batches of records off the queue.
+class _ColoredBatchListener(logging.handlers.QueueListener):
+    def handle(self, records):
+        for record in records:
+            super().handle(record)
+
+# The parent side of multiprocess logging: children set up by init_colored_worker(listener.queue), e.g. as
+# the initializer of a process pool, send their records over the queue and a single writer thread here
+# paints them and writes them buffering characters at a time, so lines of different processes never
+# interleave and each line is painted once.
+#   with ColoredLogListener() as listener:
+#       with ProcessPoolExecutor(initializer = init_colored_worker, initargs = (listener.queue, )) as pool:
+#           ...
+class ColoredLogListener():
+    def __init__(self, stream = sys.stderr, buffering = _default_buffer_capacity, queue = None):
+        if queue == None:
+            import multiprocessing
+            queue = multiprocessing.Queue()
+        self.queue = queue
+        self.__handler = BufferedColoredHandler(stream, buffering)
+        self.__listener = _ColoredBatchListener(queue, self.__handler)
+        self.__started = False
+
+    def start(self):
+        if not self.__started:
+            self.__listener.start()
+            self.__started = True
+
+    # Writes out everything the children have sent so far.
+    def stop(self):
+        if self.__started:
+            self.__listener.stop()
+            self.__started = False
+        self.__handler.flush()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+# Lets each call site, told apart by (pathname, lineno, levelno), pass rate records a second in bursts of
+# up to burst, and drops the rest before anything formats them. Every interval seconds, on a timer started
+# by the first record suppressed since the last summary, and once more at exit, each call site that lost
+# records logs how many at its own level through the handlers of logger, the logger the filter guards.
+# A suppressed record costs a few dict lookups and arithmetic on its site's state; suppressed counts them.
+class RateLimitFilter(logging.Filter):
+    def __init__(self, logger, rate = 10, burst = 10, interval = 10):
+        super().__init__()
+        self.__logger = logger
+        self.__rate = rate
+        self.__burst = burst
+        self.__interval = interval
+        self.__lock = threading.Lock()
+        self.__sites = {}
+        self.__suppressing = []
+        self.__summarized = time.monotonic()
+        self.__timer = None
+        self.suppressed = 0
+        # The timer and the exit hook only hold the filter weakly, so a filter dropped without close() does
+        # not live on. The hook is registered after logging's own, so it runs while the handlers are still open.
+        summarize = weakref.WeakMethod(self.summarize)
+        self.__summarize_weakly = lambda: _summarize_if_alive(summarize)
+        atexit.register(self.__summarize_weakly)
+
+    # State of a call site: tokens, time of the last record, records suppressed since the last summary,
+    # then what the summary record is made of.
+    def __site(self, record, now):
+        sites = self.__sites.setdefault(record.pathname, {}).setdefault(record.lineno, {})
+        return sites.setdefault(record.levelno, [ self.__burst, now, 0, record.name, record.pathname, record.lineno, record.levelno ])
+
+    def filter(self, record):
+        now = time.monotonic()
+        with self.__lock:
+            try:
+                site = self.__sites[record.pathname][record.lineno][record.levelno]
+            except KeyError:
+                site = self.__site(record, now)
+            tokens = site[0] + (now - site[1]) * self.__rate
+            site[1] = now
+            if tokens >= 1:
+                site[0] = min(tokens, self.__burst) - 1
+                passed = True
+            else:
+                site[0] = tokens
+                if not site[2]:
+                    self.__suppressing.append(site)
+                    if self.__timer == None:
+                        self.__timer = threading.Timer(max(self.__summarized + self.__interval - now, 0), self.__summarize_weakly)
+                        self.__timer.daemon = True
+                        self.__timer.start()
+                site[2] += 1
+                self.suppressed += 1
+                passed = False
+        return passed
+
+    def summarize(self):
+        with self.__lock:
+            if self.__timer != None:
+                self.__timer.cancel()
+                self.__timer = None
+            self.__summarized = time.monotonic()
+            sites, self.__suppressing = self.__suppressing, []
+            counts = [ _[2] for _ in sites ]
+            for site in sites:
+                site[2] = 0
+        for site, count in zip(sites, counts):
+            name, pathname, lineno, levelno = site[3:]
+            record = logging.LogRecord(name, levelno, pathname, lineno, '%d similar messages suppressed', (count, ), None)
+            self.__logger.callHandlers(record)
+
+    # Reports what is still suppressed, then stops the periodic and exit time summaries.
+    def close(self):
+        atexit.unregister(self.__summarize_weakly)
+        self.summarize()
+
+def _summarize_if_alive(summarize):
+    summarize = summarize()
+    if summarize != None:
+        summarize()
+
+_queue_settings = { 'queued' : False, 'maxsize' : _default_queue_size, 'overflow' : 'block', 'worker' : None, }
+_queued_handlers = {}
+
+# Queued loggers writing to the same stream share one handler and so one writer thread.
+def _queued_handler(stream):
+    if stream not in _queued_handlers:
+        _queued_handlers[stream] = QueuedColoredHandler(stream, _queue_settings['maxsize'], _queue_settings['overflow'])
+    return _queued_handlers[stream]
+
+def flush_colored_loggers(timeout = None):
+    for handler in list(_queued_handlers.values()):
+        handler.flush(timeout)
+
+# queued = None follows init_colored_logger(queued = ...); buffering is the number of characters to
+# collect before writing them at once, 0 for writing every record as it comes.
+class ColoredLogger(logging.Logger):
+    def __init__(self, name, level = logging.NOTSET, stream = sys.stderr, queued = None, buffering = 0):
+        super().__init__(name, level)
+        if _queue_settings['worker'] != None:
+            self.__stream_handler = _queue_settings['worker']
+        elif queued if queued != None else _queue_settings['queued']:
+            self.__stream_handler = _queued_handler(stream)
+        elif buffering:
+            self.__stream_handler = BufferedColoredHandler(stream, buffering)
+        else:
+            self.__stream_handler = logging.StreamHandler(stream)
+            self.__stream_handler.setFormatter(ColoredFormatter(stream = stream))
         self.addHandler(self.__stream_handler)
 
-def init_colored_logger():
+    # Installs a RateLimitFilter whose summaries come out through this logger.
+    def add_rate_limit(self, rate = 10, burst = 10, interval = 10):
+        rate_limit = RateLimitFilter(self, rate, burst, interval)
+        self.addFilter(rate_limit)
+        return rate_limit
+
+    def remove_rate_limit(self, rate_limit):
+        self.removeFilter(rate_limit)
+        rate_limit.close()
+
+    def set_stream_handler(self, handler):
+        self.removeHandler(self.__stream_handler)
+        self.__stream_handler = handler
+        self.addHandler(handler)
+
+def init_colored_logger(queued = False, maxsize = _default_queue_size, overflow = 'block'):
+    if overflow not in _queue_overflows:
+        raise ValueError('overflow must be one of %s' % ', '.join(map(repr, _queue_overflows)))
+    _queue_settings.update(queued = queued, maxsize = maxsize, overflow = overflow)
     logging.addLevelName(logging.DEBUG, 'DEBUG')
     logging.addLevelName(logging.INFO, 'INFO')
     logging.addLevelName(logging.WARNING, 'WARNING')
@@ -47,6 +411,19 @@ def init_colored_logger():
     logging.addLevelName(logging.CRITICAL, 'CRITICAL')
     logging.setLoggerClass(ColoredLogger)
 
+# Run in each child process, with the queue of a ColoredLogListener in the parent: from then on every
+# ColoredLogger of the child, including those inherited through fork, sends its records to the parent.
+def init_colored_worker(queue, batch = _default_worker_batch, **kwargs):
+    import multiprocessing.util
+    init_colored_logger(**kwargs)
+    handler = _queue_settings['worker'] = _ColoredWorkerHandler(queue, batch)
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        if isinstance(logger, ColoredLogger):
+            logger.set_stream_handler(handler)
+    # Children of multiprocessing leave through os._exit(), skipping atexit; its finalizers still run,
+    # this one before those closing the queue.
+    multiprocessing.util.Finalize(None, handler.flush, exitpriority = 100)
+
 def main(argv = None):
     if argv is None:
         argv = sys.argv
@@ -76,6 +453,18 @@ def main(argv = None):
     log.warning("This is warning")
     log.error("This is error")
     log.critical("This is critical")
+    print()
+
+    qlog = ColoredLogger('queued', logging.DEBUG, queued = True)
+    qlog.info("This is info, written by the writer thread")
+    qlog.error("This is error, written by the writer thread")
+    flush_colored_loggers()
+    print()
+
+    rate_limit = log.add_rate_limit(rate = 1, burst = 3)
+    for i in range(1000):
+        log.warning("This is warning %d from a hot loop", i)
+    log.remove_rate_limit(rate_limit)
 
 if __name__ == "__main__":
     sys.exit(main())
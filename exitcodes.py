@@ -9,7 +9,7 @@ __all__ = [
 ]
 
 import sys, signal, enum
-from colored import colorize
+from colored import Style
 from colored import ColoredSetting
 
 class exitcode(enum.IntEnum):
@@ -23,6 +23,8 @@ class exitcode(enum.IntEnum):
     EC_FATAL_SIGNAL_BASE = 128  # Base value for fatal error signal "n"
     EC_CONTRL_C = 130           # Script terminated by Control-C(128 + 2)
 
+_trapped_style = Style(fgcolor = 'green', set = ( 'bold', ))
+
 _siglist = dict((k, v) for v, k in reversed(sorted(signal.__dict__.items())) if v.startswith('SIG') and not v.startswith('SIG_'))
 
 def signame_to_signo(sname):
@@ -31,8 +33,12 @@ def signame_to_signo(sname):
 def signo_to_signame(sno):
     return _siglist.get(sno)
 
+# Records still queued by coloredlogging are written out first, if it is in use at all.
 def _on_trapped(signo, frame):
-    print(str(colorize('Interrupted by %s' % (signo_to_signame(signo)), enabling = ColoredSetting().is_colorize(sys.stderr), fgcolor = 'green', set = ( 'bold', ))), file = sys.stderr)
+    coloredlogging = sys.modules.get('coloredlogging')
+    if coloredlogging != None:
+        coloredlogging.flush_colored_loggers(timeout = 1)
+    print(_trapped_style('Interrupted by %s' % (signo_to_signame(signo)), enabling = ColoredSetting().is_colorize(sys.stderr)), file = sys.stderr)
     sys.exit(exitcode.EC_FATAL_SIGNAL_BASE + signo)
 
 def set_trap_handler(sigs, handler = None):
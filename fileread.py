@@ -5,7 +5,7 @@ __all__ = [
     'FileRead',
 ]
 
-import os, sys
+import os, sys, collections, itertools, weakref
 
 class FileRead:
     def __init__(self,
@@ -13,7 +13,10 @@ class FileRead:
         mode = 'r',
         prompt_when_stdin = None,
         openhook = None,
-        readhook = None):
+        readhook = None,
+        chunk_size = None,
+        mmap = False,
+        prefetch = 0):
         if isinstance(files, str):
             files = (files, )
         elif isinstance(files, os.PathLike):
@@ -32,25 +35,135 @@ class FileRead:
         self.__prompt_when_stdin = prompt_when_stdin
         self.__openhook = openhook or FileRead.hook_open()
         self.__readhook = readhook or (lambda f: f.read())
+        if chunk_size != None and chunk_size <= 0:
+            raise ValueError('chunk_size must be positive')
+        self.__chunk_size = chunk_size
+        if mmap and mode != 'rb':
+            raise ValueError("FileRead can only map files opened in mode 'rb'")
+        self.__mmap = mmap
+        if prefetch and (chunk_size or mmap):
+            raise ValueError('prefetch reads whole files, it cannot go with chunk_size or mmap')
+        self.__prefetch = prefetch
+        self.__iterators = weakref.WeakSet()
 
-    def __read(self):
-        for self.__filename in self.__files:
-            self.__isstdin = False
-            if self.__filename == '-':
-                self.__filename = sys.stdin.name    # '<stdin>'
-                self.__isstdin = True
-                if self.__prompt_when_stdin:
-                    print(self.__prompt_when_stdin, flush = True)
-                if 'b' in self.__mode:
-                    content = self.__readhook(getattr(sys.stdin, 'buffer', sys.stdin))
-                else:
-                    content = self.__readhook(sys.stdin)
+    # Yields whatever read yields for each file in turn, with filename() and isstdin() telling the file at
+    # hand. A file opened here is closed as soon as it is done with, or when the iteration is given up;
+    # stdin is left open.
+    def __read(self, read):
+        for filename in self.__files:
+            yield from self.__read_file(filename, read)
+
+    def __read_file(self, filename, read):
+        self.__filename = filename
+        self.__isstdin = False
+        if self.__filename == '-':
+            self.__filename = sys.stdin.name    # '<stdin>'
+            self.__isstdin = True
+            if self.__prompt_when_stdin:
+                print(self.__prompt_when_stdin, flush = True)
+            if 'b' in self.__mode:
+                yield from read(getattr(sys.stdin, 'buffer', sys.stdin))
             else:
-                content = self.__readhook(self.__openhook(self.__filename, self.__mode))
-            yield content
+                yield from read(sys.stdin)
+        else:
+            f = self.__openhook(self.__filename, self.__mode)
+            try:
+                yield from read(f)
+            finally:
+                f.close()
+
+    def __load(self, filename):
+        f = self.__openhook(filename, self.__mode)
+        try:
+            return self.__readhook(f)
+        finally:
+            f.close()
+
+    # Keeps the next prefetch files being read on a thread pool while the current one is consumed, so at
+    # most prefetch contents wait besides it. Contents come in the given order, an OSError of a file is
+    # raised when its turn comes, and stdin is read in place. openhook and readhook run on the pool.
+    def __read_prefetched(self):
+        import concurrent.futures
+        filenames = iter(self.__files)
+        executor = concurrent.futures.ThreadPoolExecutor(self.__prefetch)
+        submit = lambda filename: (filename, None if filename == '-' else executor.submit(self.__load, filename))
+        try:
+            pending = collections.deque(map(submit, itertools.islice(filenames, self.__prefetch)))
+            while pending:
+                filename, future = pending.popleft()
+                pending.extend(map(submit, itertools.islice(filenames, 1)))
+                if future == None:
+                    yield from self.__read_file(filename, self.__read_content)
+                else:
+                    self.__filename = filename
+                    self.__isstdin = False
+                    yield future.result()
+        finally:
+            executor.shutdown(cancel_futures = True)
+
+    def __read_content(self, f):
+        yield self.__readhook(f)
+
+    # At most chunk_size characters, or bytes in mode 'rb', are held at a time.
+    def __read_chunks(self, f):
+        while True:
+            chunk = f.read(self.__chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    # Each regular file is yielded as a read-only mmap, unmapped as soon as the iteration moves on unless
+    # views of it are still held; stdin, pipes, empty files and anything else that cannot be mapped are read
+    # the usual way.
+    def __read_mapped(self, f):
+        import mmap, stat
+        try:
+            st = os.fstat(f.fileno())
+            m = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) if not self.__isstdin and stat.S_ISREG(st.st_mode) and st.st_size else None
+        except (AttributeError, OSError, ValueError):
+            m = None
+        if m == None:
+            yield from self.__read_chunks(f) if self.__chunk_size else self.__read_content(f)
+            return
+        try:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                m.madvise(mmap.MADV_SEQUENTIAL)
+            yield m
+        finally:
+            try:
+                m.close()
+            except BufferError:
+                pass
+
+    # Every iteration is independent of the others; they are only held weakly, so one given up is closed,
+    # together with its file, as soon as it is dropped.
+    def __start(self, iterator):
+        self.__iterators.add(iterator)
+        return iterator
 
+    # Yields the whole content of each file, its chunks if chunk_size is given, or a map of it with mmap.
     def __iter__(self):
-        return self.__read()
+        if self.__prefetch:
+            return self.__start(self.__read_prefetched())
+        if self.__mmap:
+            return self.__start(self.__read(self.__read_mapped))
+        return self.__start(self.__read(self.__read_chunks if self.__chunk_size else self.__read_content))
+
+    # Yields the lines of each file, one line held at a time.
+    def lines(self):
+        return self.__start(self.__read(iter))
+
+    # Closes the files of the iterations left unfinished.
+    def close(self):
+        for iterator in list(self.__iterators):
+            iterator.close()
+        self.__iterators.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def isstdin(self):
         return self.__isstdin
@@ -110,6 +223,22 @@ def main(argv = None):
     except OSError as e:
         print(str(e))
 
+    files = ( '/home/wangrj/bbb', '/home/wangrj/a.sh' )
+    with FileRead(files, mode = 'rb', chunk_size = 1 << 20) as fl:
+        try:
+            print(sum(map(len, fl)), 'bytes read 1 MiB at a time')
+            print(sum(1 for line in fl.lines()), 'lines read one at a time')
+        except OSError as e:
+            print(str(e))
+
+    files = ( '/home/wangrj/a.php', '/home/wangrj/a.sh', '/home/wangrj/b.sh', '/home/wangrj/bbb' )
+    fl = FileRead(files, prefetch = 2)
+    try:
+        for cont in fl:
+            print(fl.filename(), fl.isstdin(), len(cont), 'read ahead of time')
+    except OSError as e:
+        print(str(e))
+
     files = '/home/wangrj/zh.txt'
     def myopen(f, m, encoding, errors):
         print('myopen, filename: %s, mode: %s, encoding: %s, errors: %s' % (f, m, encoding, errors))
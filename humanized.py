@@ -13,11 +13,12 @@ __all__ = [
     'humanizedpercentage2',
 ]
 
-import textwrap, ipaddress
 from utils import inversed_textwrap
+from utils import roundup
 from utils import cut_integer
 
 def humanizedbin(num, wrapwidth = 4, sep = ' '):
+    import textwrap
     if num < 0:
         sign = '-'
         s = '{:b}'.format(num)[1:]
@@ -28,6 +29,7 @@ def humanizedbin(num, wrapwidth = 4, sep = ' '):
 
 # Format two's complement representation
 def humanizedtwoscompbin(num, bits = 32, wrapwidth = 4, sep = ' '):
+    import textwrap
     s = '{:b}'.format(cut_integer(num, bits))
     return '%s' % (sep.join(textwrap.wrap(s.zfill(bits), wrapwidth)))
 
@@ -59,6 +61,7 @@ def humanizeddec(num, wrapwidth = 3, sep = ','):
     return '%s%s' % (sign, sep.join(inversed_textwrap(s, wrapwidth)))
 
 def humanizedbinip(ipaddr):
+    import textwrap
     if ipaddr.version == 4:
         fillwidth = 32
         wrapwidth = 8
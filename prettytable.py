@@ -4,27 +4,291 @@
 __all__ = [
     'PrettyTable',
     'PrettyVTable',
+    'LivePrettyTable',
+    'PrettyTableView',
+    'LivePrettyVTable',
 ]
 
-import sys, os, collections, itertools
+import sys, os, collections, itertools, array, operator, heapq
 from utils import align_size
-from utils import RingLooper
-from utils import transposelist
-from colored import colorize
+from utils import get_terminal_size
+from utils import streamistty
+from colored import Style
+from colored import asstyle
+from colored import strip_ansi
+from colored import visible_width
 from colored import ColoredSetting
 
-_default_field_paint = {'set' : ( 'bold', )}
+_default_field_paint = Style(set = ( 'bold', ))
 
-_default_palette_paints = ( { 'fgcolor' : 'green',          'set' : ( 'bold', ) },
-                            { 'fgcolor' : 'yellow',         'set' : ( 'bold', ) },
-                            { 'fgcolor' : 'blue',           'set' : ( 'bold', ) },
-                            { 'fgcolor' : 'magenta',        'set' : ( 'bold', ) },
-                            { 'fgcolor' : 'cyan',           'set' : ( 'bold', ) },
-                            { 'fgcolor' : 'light green',    'set' : ( 'bold', ) },
-                            { 'fgcolor' : 'light yellow',   'set' : ( 'bold', ) },
-                            { 'fgcolor' : 'light blue',     'set' : ( 'bold', ) },
-                            { 'fgcolor' : 'light magenta',  'set' : ( 'bold', ) },
-                            { 'fgcolor' : 'light cyan',     'set' : ( 'bold', ) }, )
+_default_palette_paints = ( Style(fgcolor = 'green',          set = ( 'bold', )),
+                            Style(fgcolor = 'yellow',         set = ( 'bold', )),
+                            Style(fgcolor = 'blue',           set = ( 'bold', )),
+                            Style(fgcolor = 'magenta',        set = ( 'bold', )),
+                            Style(fgcolor = 'cyan',           set = ( 'bold', )),
+                            Style(fgcolor = 'light green',    set = ( 'bold', )),
+                            Style(fgcolor = 'light yellow',   set = ( 'bold', )),
+                            Style(fgcolor = 'light blue',     set = ( 'bold', )),
+                            Style(fgcolor = 'light magenta',  set = ( 'bold', )),
+                            Style(fgcolor = 'light cyan',     set = ( 'bold', )), )
+
+_default_chunk_rows = 1024
+_default_bulk_chunk_rows = 65536
+_default_terminal_lines = 24
+_default_parallel_chunk_rows = 32768
+
+# Write lines to stream in batches of chunk_rows, so the output never has to be held in memory at once.
+def _write_lines(stream, lines, chunk_rows = _default_chunk_rows):
+    if chunk_rows < 1:
+        raise ValueError('chunk_rows must be greater than 0')
+    while True:
+        chunk = ''.join(itertools.islice(lines, chunk_rows))
+        if not chunk:
+            break
+        stream.write(chunk)
+
+# NumPy is optional, an array can only be handed to us if it has been imported already.
+def _isndarray(obj):
+    numpy = sys.modules.get('numpy')
+    return numpy != None and isinstance(obj, numpy.ndarray)
+
+# Split records into lists of rows. DB-API cursors are drained through fetchmany.
+def _iter_record_chunks(records, chunk_rows = _default_bulk_chunk_rows):
+    if _isndarray(records):
+        for i in range(0, len(records), chunk_rows):
+            yield records[i:i + chunk_rows].tolist()
+    elif hasattr(records, 'fetchmany'):
+        while True:
+            rows = records.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+    else:
+        records = iter(records)
+        while True:
+            rows = list(itertools.islice(records, chunk_rows))
+            if not rows:
+                break
+            yield rows
+
+_table_write_options = ( 'chunk_rows', 'workers', )
+_csv_write_options = ( 'delimiter', 'doublequote', 'escapechar', 'lineterminator', 'quotechar', 'quoting', 'skipinitialspace', 'strict', )
+
+_json_scalar_types = { int, float, bool, type(None), }
+
+# A list of scalars is encoded in a single call and split, as their encodings never contain a comma.
+def _json_encode_column(encode, values):
+    import json
+    types = set(map(type, values))
+    if types <= { str }:
+        return list(map(json.encoder.encode_basestring, values))
+    if types <= _json_scalar_types:
+        return encode(list(values))[1:-1].split(',')
+    return list(map(encode, values))
+
+# Runs in a worker process of the pool.
+def _format_chunk(row_formatter, offset, columns):
+    return ''.join(row_formatter.lines(zip(*columns), offset))
+
+# Yields the results of func over argslist in submission order, keeping at most two tasks per worker in
+# flight so neither the pickled input nor the formatted output of the whole table is held at once.
+def _iter_in_pool(func, argslist, workers):
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = collections.deque()
+        for args in argslist:
+            pending.append(executor.submit(func, *args))
+            if len(pending) > workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# Plain text takes one terminal column per character, so len() and str.format padding get it right.
+_isplain = lambda text: text.isascii() and '\033' not in text
+
+# Pads text to width terminal columns the way str.format would, going by its visible width.
+def _pad(text, alignment, width):
+    fill = width - visible_width(text)
+    if fill <= 0:
+        return text
+    if alignment == '<':
+        return text + ' ' * fill
+    if alignment == '>':
+        return ' ' * fill + text
+    return ' ' * (fill // 2) + text + ' ' * (fill - fill // 2)
+
+# Splits text into pieces of at most width terminal columns.
+def _split_visible(text, width):
+    width = max(width, 1)
+    if _isplain(text):
+        return [ text[i:i + width] for i in range(0, len(text), width) ] or [ '' ]
+    pieces, piece, used = [], '', 0
+    for char in strip_ansi(text):
+        char_width = visible_width(char)
+        if used + char_width > width and piece:
+            pieces.append(piece)
+            piece, used = '', 0
+        piece += char
+        used += char_width
+    pieces.append(piece)
+    return pieces
+
+# Returns the format string of a row and the (index, alignment, width) of the columns that format cannot
+# pad, because they hold escape sequences or wide characters; plains tells which columns are known to be
+# plain, None that nothing is known.
+def _make_layout(padding_characters, alignments, widths, plains = None):
+    plains = plains if plains != None else [ False ] * len(widths)
+    fmtstr = padding_characters.join([ '{:%s%d}' % (_, __) if ___ else '{}' for _, __, ___ in zip(alignments, widths, plains) ])
+    return fmtstr, [ (i, _, __) for i, (_, __, ___) in enumerate(zip(alignments, widths, plains)) if not ___ ]
+
+# Compiled once per render: holds the bound fmtstr.format and the (prefix, suffix) escape pair of every
+# palette slot, so formatting a row is one format call and two concatenations.
+class _RowFormatter():
+    __slots__ = ( '__format', '__padded', '__paints', )
+
+    def __init__(self, layout, paints, enabling = True):
+        fmtstr, self.__padded = layout
+        self.__format = fmtstr.format
+        self.__paints = []
+        for paint in map(asstyle, paints):
+            self.__paints.append((paint.prefix(), paint.reset() + os.linesep) if enabling else ('', os.linesep))
+        if not self.__paints:
+            self.__paints.append(('', os.linesep))
+
+    def __cells(self, row):
+        cells = list(map(str, row))
+        for i, alignment, width in self.__padded:
+            cells[i] = _pad(cells[i], alignment, width)
+        return cells
+
+    def line(self, row, slot = 0):
+        prefix, suffix = self.__paints[slot % len(self.__paints)]
+        return prefix + self.__format(*(self.__cells(row) if self.__padded else map(str, row))) + suffix
+
+    # Palette slots are assigned round robin starting at slot offset.
+    def lines(self, rows, offset = 0):
+        fmt = self.__format
+        offset %= len(self.__paints)
+        paints = itertools.cycle(self.__paints[offset:] + self.__paints[:offset])
+        if self.__padded:
+            for r, (prefix, suffix) in zip(rows, paints):
+                yield prefix + fmt(*self.__cells(r)) + suffix
+        else:
+            for r, (prefix, suffix) in zip(rows, paints):
+                yield prefix + fmt(*map(str, r)) + suffix
+
+# Widest value and whether all values are plain, taking chunk_rows values at a time so that measuring never
+# holds more than that many str, the common case taking only C-level passes.
+def _measure(values, chunk_rows = _default_bulk_chunk_rows):
+    values = iter(values)
+    width, plain = 0, True
+    while True:
+        strs = list(map(str, itertools.islice(values, chunk_rows)))
+        if not strs:
+            return width, plain
+        if _isplain(''.join(strs)):
+            width = max(max(map(len, strs)), width)
+        else:
+            width = max(max(map(visible_width, strs)), width)
+            plain = False
+
+# Column-oriented storage of one field. Values keep their original type and are only turned into str at
+# render time; integers are packed into an array('q') until anything else shows up in the column. Integers
+# are measured through the smallest and largest one seen, anything else in one pass over the values that
+# came in since the last width() call, by their visible width if they are not plain.
+class _Column():
+    __slots__ = ( '__values', '__width', '__plain', '__measured', '__minint', '__maxint', )
+
+    def __init__(self, name = ''):
+        self.__values = array.array('q')
+        self.__width = visible_width(name)
+        self.__plain = _isplain(name)
+        self.__measured = 0
+        self.__minint = None
+        self.__maxint = None
+
+    def append(self, value):
+        if type(value) is int:
+            if self.__minint == None:
+                self.__minint = self.__maxint = value
+            elif value < self.__minint:
+                self.__minint = value
+            elif value > self.__maxint:
+                self.__maxint = value
+            try:
+                self.__values.append(value)
+            except OverflowError:
+                self.__unpack()
+                self.__values.append(value)
+        else:
+            if type(self.__values) is array.array:
+                self.__unpack()
+            self.__values.append(value)
+
+    def extend(self, values):
+        if _isndarray(values):
+            if values.dtype.kind in 'iu' and len(values) and type(self.__values) is array.array:
+                minint, maxint = int(values.min()), int(values.max())
+                if minint >= -(1 << 63) and maxint < (1 << 63):
+                    self.__values.frombytes(values.astype('int64').tobytes())
+                    self.__track_ints(minint, maxint)
+                    return
+            values = values.tolist()
+        elif not isinstance(values, (list, tuple)):
+            values = list(values)
+        if not values:
+            return
+        if set(map(type, values)) == { int }:
+            self.__track_ints(min(values), max(values))
+            if type(self.__values) is array.array:
+                size = len(self.__values)
+                try:
+                    self.__values.extend(values)
+                    return
+                except OverflowError:
+                    del self.__values[size:]
+                    self.__unpack()
+        elif type(self.__values) is array.array:
+            self.__unpack()
+        self.__values.extend(values)
+
+    # Integers already stored are accounted for by minint and maxint.
+    def __unpack(self):
+        self.__values = list(self.__values)
+        self.__measured = len(self.__values)
+
+    def __track_ints(self, minint, maxint):
+        if self.__minint == None:
+            self.__minint, self.__maxint = minint, maxint
+        else:
+            self.__minint, self.__maxint = min(minint, self.__minint), max(maxint, self.__maxint)
+
+    def width(self):
+        if self.__measured < len(self.__values) and type(self.__values) is list:
+            width, plain = _measure(map(self.__values.__getitem__, range(self.__measured, len(self.__values))))
+            self.__width = max(width, self.__width)
+            self.__plain = self.__plain and plain
+            self.__measured = len(self.__values)
+        if self.__minint == None:
+            return self.__width
+        return max(len(str(self.__minint)), len(str(self.__maxint)), self.__width)
+
+    def plain(self):
+        self.width()
+        return self.__plain
+
+    # Width and plainness of the values at the given positions only.
+    def measure(self, indices):
+        return _measure(map(self.__values.__getitem__, indices))
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __getitem__(self, index):
+        return self.__values[index]
+
+    def __iter__(self):
+        return iter(self.__values)
 
 class PrettyTable():
     def __init__(self,
@@ -41,8 +305,7 @@ class PrettyTable():
         self.__fields = []
         self.__field_alignments = []
         self.__fixed_width_of_fields = []
-        self.__records = []
-        self.__max_size_of_columns = []
+        self.__columns = []
 
     def add_field(self, name, alignment = '<', fixed_width = None):
         self.__fields.append(name)
@@ -50,30 +313,442 @@ class PrettyTable():
             raise ValueError("alignment must be one of '<', '>' and '^'")
         self.__field_alignments.append(alignment)
         self.__fixed_width_of_fields.append(fixed_width)
-        self.__max_size_of_columns.append(len(name))
+        self.__columns.append(_Column(name))
 
     def add_record(self, *record):
         if len(record) != len(self.__fields):
             raise ValueError('record and fields must have the same length')
-        record = list(map(str, record))
-        self.__records.append(record)
-        self.__max_size_of_columns = [ max(len(_), __) for _, __ in zip(record, self.__max_size_of_columns) ]
+        for _, __ in zip(self.__columns, record):
+            _.append(__)
 
-    def to_string(self):
-        aligned_width_of_columns = map(lambda x: align_size(x, self.__align_boundary), self.__max_size_of_columns)
+    # Accepts any iterable of records, a DB-API cursor or a 2-D NumPy array.
+    def add_records(self, records, chunk_rows = _default_bulk_chunk_rows):
+        number_of_fields = len(self.__fields)
+        if _isndarray(records):
+            if records.ndim != 2 or records.shape[1] != number_of_fields:
+                raise ValueError('record and fields must have the same length')
+            for i, column in enumerate(self.__columns):
+                column.extend(records[:, i])
+            return
+        for rows in _iter_record_chunks(records, chunk_rows):
+            if set(map(len, rows)) != { number_of_fields }:
+                raise ValueError('record and fields must have the same length')
+            for i, column in enumerate(self.__columns):
+                column.extend(list(map(operator.itemgetter(i), rows)))
+
+    @classmethod
+    def from_columns(cls, columns, **kwargs):
+        if len(set(map(len, columns.values()))) > 1:
+            raise ValueError('columns must have the same length')
+        pt = cls(**kwargs)
+        for name, values in columns.items():
+            pt.add_field(name)
+            pt.__columns[-1].extend(values)
+        return pt
+
+    def iter_lines(self):
+        return self.__iter_lines(0, len(self))
+
+    # Returns the painted header line and the formatter of the records.
+    def __compile(self, max_size_of_columns, plains):
+        aligned_width_of_columns = map(lambda x: align_size(x, self.__align_boundary), max_size_of_columns)
         aligned_width_of_columns = [ i if j == None else j for i, j in zip(aligned_width_of_columns, self.__fixed_width_of_fields) ]
-        fmtstr = self.__padding_characters.join(['{:%s%d}' % (_, __) for _, __ in zip(self.__field_alignments, aligned_width_of_columns)])
-        string = colorize(fmtstr.format(*self.__fields), enabling = self.__enable_painting, **self.__field_paint)
-        string += os.linesep
-        paletteiter = iter(RingLooper(*self.__palette_paints))
-        for r in self.__records:
-            string += colorize(fmtstr.format(*r), enabling = self.__enable_painting, **next(paletteiter))
-            string += os.linesep
-        return string
+        layout = _make_layout(self.__padding_characters, self.__field_alignments, aligned_width_of_columns, plains)
+        return (_RowFormatter(layout, (self.__field_paint, ), self.__enable_painting).line(self.__fields),
+            _RowFormatter(layout, self.__palette_paints, self.__enable_painting))
+
+    # Column widths come from the whole table, so every window lines up with the others, and the
+    # palette slots continue from the first record of the window as if the whole table were rendered.
+    def __iter_lines(self, start, stop):
+        header, row_formatter = self.__compile([ _.width() for _ in self.__columns ], [ _.plain() for _ in self.__columns ])
+        yield header
+        if start == 0 and stop == len(self):
+            columns = self.__columns
+        else:
+            columns = [ _[start:stop] for _ in self.__columns ]
+        yield from row_formatter.lines(zip(*columns), start)
+
+    # Contiguous chunks of records are formatted in a process pool. Each chunk starts its palette at its
+    # own offset, so the colors are the same as in a serial render.
+    def __iter_parallel_chunks(self, workers):
+        header, row_formatter = self.__compile([ _.width() for _ in self.__columns ], [ _.plain() for _ in self.__columns ])
+        yield header
+        argslist = ( (row_formatter, _, [ __[_:_ + _default_parallel_chunk_rows] for __ in self.__columns ])
+            for _ in range(0, len(self), _default_parallel_chunk_rows) )
+        yield from _iter_in_pool(_format_chunk, argslist, workers)
+
+    # Renders the records at the given positions, sized to those records only.
+    def __iter_indexed_lines(self, indices):
+        measures = [ _.measure(indices) for _ in self.__columns ]
+        header, row_formatter = self.__compile([ max(visible_width(_), __) for _, (__, ___) in zip(self.__fields, measures) ],
+            [ _isplain(_) and ___ for _, (__, ___) in zip(self.__fields, measures) ])
+        yield header
+        yield from row_formatter.lines(zip(*[ map(_.__getitem__, indices) for _ in self.__columns ]))
+
+    def __column(self, field):
+        if isinstance(field, int):
+            return self.__columns[field]
+        if field not in self.__fields:
+            raise ValueError('no such field: %r' % (field, ))
+        return self.__columns[self.__fields.index(field)]
+
+    def __view(self):
+        return PrettyTableView(self.__iter_indexed_lines, self.__column, self.__fields, range(len(self)))
+
+    def sort_by(self, field, reverse = False, key = None):
+        return self.__view().sort_by(field, reverse, key)
+
+    def top_k(self, field, k, key = None, smallest = False):
+        return self.__view().top_k(field, k, key, smallest)
+
+    def where(self, predicate, field = None):
+        return self.__view().where(predicate, field)
+
+    def render_window(self, start, stop):
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return ''.join(self.__iter_lines(start, max(start, stop)))
+
+    # Pages are numbered from 0; by default a page plus its header fills the terminal.
+    def render_page(self, page, page_size = None):
+        page_size = page_size or self.__default_page_size()
+        return self.render_window(page * page_size, (page + 1) * page_size)
+
+    def number_of_pages(self, page_size = None):
+        page_size = page_size or self.__default_page_size()
+        return max((len(self) + page_size - 1) // page_size, 1)
+
+    def __default_page_size(self):
+        columns, lines = get_terminal_size()
+        return max((lines or _default_terminal_lines) - 2, 1)
+
+    def __len__(self):
+        return len(self.__columns[0]) if self.__columns else 0
+
+    def write_to(self, stream = sys.stdout, chunk_rows = _default_chunk_rows, workers = None):
+        if workers:
+            for _ in self.__iter_parallel_chunks(workers):
+                stream.write(_)
+        else:
+            _write_lines(stream, self.iter_lines(), chunk_rows)
+
+    def to_string(self, workers = None):
+        return ''.join(self.__iter_parallel_chunks(workers) if workers else self.iter_lines())
+
+    # Machine-readable output: no widths are computed and nothing is painted.
+    def write_csv(self, stream = sys.stdout, dialect = 'excel', **fmtparams):
+        import csv
+        fmtparams.setdefault('lineterminator', os.linesep)
+        writer = csv.writer(stream, dialect, **fmtparams)
+        writer.writerow(self.__fields)
+        writer.writerows(zip(*self.__columns))
+
+    def write_tsv(self, stream = sys.stdout, **fmtparams):
+        self.write_csv(stream, 'excel-tab', **fmtparams)
+
+    # Values keep their type, anything JSON has no type for is written as its str. Records are encoded a
+    # column chunk at a time and put together with a precompiled line template.
+    def write_jsonl(self, stream = sys.stdout, chunk_rows = _default_bulk_chunk_rows):
+        import json
+        encode = json.JSONEncoder(ensure_ascii = False, separators = (',', ':'), default = str).encode
+        keys = [ json.dumps(str(_), ensure_ascii = False).replace('{', '{{').replace('}', '}}') for _ in self.__fields ]
+        template = '{{' + ','.join([ _ + ':{}' for _ in keys ]) + '}}' + os.linesep
+        for i in range(0, len(self), chunk_rows):
+            values = [ _json_encode_column(encode, _[i:i + chunk_rows]) for _ in self.__columns ]
+            stream.write(''.join(map(template.format, *values)))
+
+    # The aligned and painted table goes to terminals, 'auto' picks tsv for anything else. kwargs go to the
+    # writer of the format; with 'auto' they may be any of the options of write_to() (chunk_rows, workers)
+    # and of csv.writer (delimiter, quoting, ...), each only taken by the writer it belongs to, so the same
+    # call works wherever the output goes.
+    def write(self, stream = sys.stdout, format = 'auto', **kwargs):
+        if format == 'auto':
+            unknown = set(kwargs) - set(_table_write_options) - set(_csv_write_options)
+            if unknown:
+                raise TypeError('unexpected option for format auto: %s' % ', '.join(sorted(unknown)))
+            format = 'table' if streamistty(stream) else 'tsv'
+            options = _table_write_options if format == 'table' else _csv_write_options
+            kwargs = { k : v for k, v in kwargs.items() if k in options }
+        writers = { 'table' : self.write_to, 'tsv' : self.write_tsv, 'csv' : self.write_csv, 'jsonl' : self.write_jsonl, }
+        if format not in writers:
+            raise ValueError("format must be one of 'auto', 'table', 'tsv', 'csv' and 'jsonl'")
+        writers[format](stream, **kwargs)
+
+    def __str__(self):
+        return self.to_string()
+
+# A sorted or filtered view of a PrettyTable. Only the positions of the visible records are kept, in an
+# array('q'); the values are read from the table's columns when the view is rendered, and the columns are
+# sized to the visible records. Views can be narrowed further with the same methods.
+class PrettyTableView():
+    def __init__(self, iter_indexed_lines, column, fields, indices):
+        self.__iter_indexed_lines = iter_indexed_lines
+        self.__column = column
+        self.__fields = fields
+        self.__indices = indices
+
+    def __derive(self, indices):
+        return PrettyTableView(self.__iter_indexed_lines, self.__column, self.__fields, array.array('q', indices))
+
+    def __sortkey(self, field, key):
+        values = self.__column(field)
+        return values.__getitem__ if key == None else lambda i: key(values[i])
+
+    def sort_by(self, field, reverse = False, key = None):
+        return self.__derive(sorted(self.__indices, key = self.__sortkey(field, key), reverse = reverse))
+
+    # Largest k records by field, or smallest; O(n log k) through a heap of k positions.
+    def top_k(self, field, k, key = None, smallest = False):
+        select = heapq.nsmallest if smallest else heapq.nlargest
+        return self.__derive(select(k, self.__indices, key = self.__sortkey(field, key)))
+
+    # predicate gets the value of field, or a dict of the whole record keyed by field name.
+    def where(self, predicate, field = None):
+        if field != None:
+            values = self.__column(field)
+            return self.__derive([ _ for _ in self.__indices if predicate(values[_]) ])
+        columns = [ self.__column(_) for _ in range(len(self.__fields)) ]
+        return self.__derive([ _ for _ in self.__indices if predicate(dict(zip(self.__fields, [ __[_] for __ in columns ]))) ])
+
+    def iter_lines(self):
+        return self.__iter_indexed_lines(self.__indices)
+
+    def write_to(self, stream = sys.stdout, chunk_rows = _default_chunk_rows):
+        _write_lines(stream, self.iter_lines(), chunk_rows)
+
+    def to_string(self):
+        return ''.join(self.iter_lines())
 
     def __str__(self):
         return self.to_string()
 
+    def __len__(self):
+        return len(self.__indices)
+
+_overflow_policies = ( 'truncate', 'wrap', 'widen', )
+
+# Cuts the cells that are wider than their column, or wraps them onto continuation rows.
+def _fit_row(row, widths, overflow):
+    pieces = [ _split_visible(_, __) for _, __ in zip(row, widths) ]
+    if overflow == 'truncate':
+        return [ [ _[0] for _ in pieces ] ]
+    return itertools.zip_longest(*pieces, fillvalue = '')
+
+# Emits every record as soon as it is added instead of keeping it, so memory stays constant however many
+# rows pass through. Column widths are fixed before the header is written: fixed_width on add_field wins,
+# then width_hint (an int for all fields, or a dict keyed by field name), then the widest of the first
+# sample_rows records, which are held back until the sample is complete.
+class LivePrettyTable():
+    def __init__(self,
+        stream = sys.stdout,
+        enable_painting = True,
+        field_paint = None,
+        palette_paints = None,
+        padding_characters = '    ',
+        align_boundary = 4,
+        sample_rows = 0,
+        width_hint = None,
+        overflow = 'truncate'):
+        if overflow not in _overflow_policies:
+            raise ValueError("overflow must be one of 'truncate', 'wrap' and 'widen'")
+        self.__stream = stream
+        self.__enable_painting = enable_painting
+        self.__field_paint = field_paint if field_paint != None else _default_field_paint
+        self.__palette_paints = palette_paints if palette_paints != None else _default_palette_paints
+        self.__padding_characters = padding_characters
+        self.__align_boundary = align_boundary
+        self.__sample_rows = sample_rows
+        self.__width_hint = width_hint
+        self.__overflow = overflow
+        self.__fields = []
+        self.__field_alignments = []
+        self.__fixed_width_of_fields = []
+        self.__width_of_columns = None
+        self.__row_formatter = None
+        self.__samples = []
+        self.__number_of_records = 0
+
+    def add_field(self, name, alignment = '<', fixed_width = None):
+        if self.__width_of_columns != None:
+            raise ValueError('cannot add fields after the header has been written')
+        if alignment not in '<^>':
+            raise ValueError("alignment must be one of '<', '>' and '^'")
+        self.__fields.append(name)
+        self.__field_alignments.append(alignment)
+        self.__fixed_width_of_fields.append(fixed_width)
+
+    def add_record(self, *record):
+        if len(record) != len(self.__fields):
+            raise ValueError('record and fields must have the same length')
+        record = list(map(str, record))
+        if self.__width_of_columns == None:
+            if len(self.__samples) < self.__sample_rows:
+                self.__samples.append(record)
+                if len(self.__samples) < self.__sample_rows:
+                    return
+                record = None
+            self.__write_header()
+            for r in self.__samples:
+                self.__write_record(r)
+            self.__samples = []
+            if record == None:
+                return
+        self.__write_record(record)
+
+    def close(self):
+        if self.__width_of_columns == None:
+            self.__write_header()
+            for r in self.__samples:
+                self.__write_record(r)
+            self.__samples = []
+        self.__stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __hinted_width(self, name):
+        if isinstance(self.__width_hint, dict):
+            return self.__width_hint.get(name, 0)
+        return self.__width_hint or 0
+
+    def __write_header(self):
+        max_size_of_columns = [ max(visible_width(_), self.__hinted_width(_)) for _ in self.__fields ]
+        for r in self.__samples:
+            max_size_of_columns = [ max(visible_width(_), __) for _, __ in zip(r, max_size_of_columns) ]
+        aligned_width_of_columns = map(lambda x: align_size(x, self.__align_boundary), max_size_of_columns)
+        self.__width_of_columns = [ i if j == None else j for i, j in zip(aligned_width_of_columns, self.__fixed_width_of_fields) ]
+        self.__emit_header()
+
+    def __emit_header(self):
+        layout = _make_layout(self.__padding_characters, self.__field_alignments, self.__width_of_columns)
+        self.__row_formatter = _RowFormatter(layout, self.__palette_paints, self.__enable_painting)
+        fields = [ _split_visible(_, __)[0] for _, __ in zip(self.__fields, self.__width_of_columns) ]
+        self.__stream.write(_RowFormatter(layout, (self.__field_paint, ), self.__enable_painting).line(fields))
+
+    def __write_record(self, record):
+        slot = self.__number_of_records
+        self.__number_of_records += 1
+        widths = self.__width_of_columns
+        if any(visible_width(_) > __ for _, __ in zip(record, widths)):
+            if self.__overflow == 'widen':
+                self.__width_of_columns = [ max(align_size(visible_width(_), self.__align_boundary), __) for _, __ in zip(record, widths) ]
+                self.__emit_header()
+            else:
+                self.__stream.write(''.join([ self.__row_formatter.line(_, slot) for _ in _fit_row(record, widths, self.__overflow) ]))
+                return
+        self.__stream.write(self.__row_formatter.line(record, slot))
+
+# Streaming counterpart of PrettyVTable. A group is written as soon as all of its columns are filled and
+# only the group being filled is kept, so memory stays constant however many records pass through. The
+# width of the record columns is fixed_width on add_column, else width_hint, else the widest record of the
+# first sample_groups groups, which are held back until the sample is complete. close() writes the last,
+# partially filled group. Cells that do not fit are truncated or wrapped.
+class LivePrettyVTable():
+    def __init__(self,
+        stream = sys.stdout,
+        enable_painting = True,
+        palette_paints = None,
+        padding_characters = '    ',
+        align_boundary = 4,
+        sample_groups = 0,
+        width_hint = None,
+        overflow = 'truncate'):
+        if overflow not in ( 'truncate', 'wrap', ):
+            raise ValueError("overflow must be one of 'truncate' and 'wrap'")
+        self.__stream = stream
+        self.__enable_painting = enable_painting
+        self.__palette_paints = palette_paints if palette_paints != None else _default_palette_paints
+        self.__padding_characters = padding_characters
+        self.__align_boundary = align_boundary
+        self.__sample_groups = sample_groups
+        self.__width_hint = width_hint
+        self.__overflow = overflow
+        self.__fields = []
+        self.__column_alignments = []
+        self.__fixed_width_of_columns = []
+        self.__width_of_columns = None
+        self.__row_formatter = None
+        self.__samples = []
+        self.__group = []
+        self.__number_of_groups = 0
+
+    def add_column(self, alignment = '<', fixed_width = None):
+        if self.__width_of_columns != None or self.__group or self.__samples:
+            raise ValueError('cannot add columns after records have been added')
+        if alignment not in '<^>':
+            raise ValueError("alignment must be one of '<', '>' and '^'")
+        self.__column_alignments.append(alignment)
+        self.__fixed_width_of_columns.append(fixed_width)
+
+    def add_field(self, name):
+        if self.__width_of_columns != None or self.__group or self.__samples:
+            raise ValueError('cannot add fields after records have been added')
+        if not self.__column_alignments:
+            for i in range(2):
+                self.add_column()
+        elif len(self.__column_alignments) < 2:
+            raise ValueError('must be at least two columns')
+        self.__fields.append(name)
+
+    def add_record(self, *record):
+        if len(record) != len(self.__fields):
+            raise ValueError('record and fields must have the same length')
+        self.__group.append(list(map(str, record)))
+        if len(self.__group) == len(self.__column_alignments) - 1:
+            self.__add_group(self.__group)
+            self.__group = []
+
+    def close(self):
+        if self.__group:
+            empty_records_for_fill = [[''] * len(self.__fields)] * (len(self.__column_alignments) - 1 - len(self.__group))
+            self.__add_group(self.__group + empty_records_for_fill)
+            self.__group = []
+        if self.__width_of_columns == None:
+            self.__fix_widths()
+        self.__stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __add_group(self, group):
+        if self.__width_of_columns == None:
+            self.__samples.append(group)
+            if len(self.__samples) < self.__sample_groups:
+                return
+            self.__fix_widths()
+        else:
+            self.__write_group(group)
+
+    def __fix_widths(self):
+        max_size_of_columns = [ max(map(visible_width, self.__fields), default = 0) ]
+        max_size_of_columns.extend([ self.__width_hint or 0 ] * (len(self.__column_alignments) - 1))
+        for group in self.__samples:
+            max_size_of_columns[1:] = [ max(*map(visible_width, _), __) for _, __ in zip(group, max_size_of_columns[1:]) ]
+        aligned_width_of_columns = map(lambda x: align_size(x, self.__align_boundary), max_size_of_columns)
+        self.__width_of_columns = [ i if j == None else j for i, j in zip(aligned_width_of_columns, self.__fixed_width_of_columns) ]
+        layout = _make_layout(self.__padding_characters, self.__column_alignments, self.__width_of_columns)
+        self.__row_formatter = _RowFormatter(layout, self.__palette_paints, self.__enable_painting)
+        for group in self.__samples:
+            self.__write_group(group)
+        self.__samples = []
+
+    def __write_group(self, group):
+        slot = self.__number_of_groups
+        self.__number_of_groups += 1
+        widths = self.__width_of_columns
+        lines = []
+        for row in zip(self.__fields, *group):
+            if any(visible_width(_) > __ for _, __ in zip(row, widths)):
+                lines.extend([ self.__row_formatter.line(_, slot) for _ in _fit_row(row, widths, self.__overflow) ])
+            else:
+                lines.append(self.__row_formatter.line(row, slot))
+        self.__stream.write(''.join(lines))
+
 class PrettyVTable():
     def __init__(self,
         enable_painting = True,
@@ -89,6 +764,7 @@ class PrettyVTable():
         self.__column_alignments = []
         self.__fixed_width_of_columns = []
         self.__max_size_of_columns = []
+        self.__plain_columns = []
         self.__column_cycler = None
 
     def add_column(self, alignment = '<', fixed_width = None):
@@ -97,6 +773,7 @@ class PrettyVTable():
         self.__column_alignments.append(alignment)
         self.__fixed_width_of_columns.append(fixed_width)
         self.__max_size_of_columns.append(0)
+        self.__plain_columns.append(True)
 
     def __make_default_columns(self, num, alignment = '<', fixed_width = None):
         for i in range(num):
@@ -108,7 +785,7 @@ class PrettyVTable():
         elif len(self.__column_alignments) < 2:
             raise ValueError('must be at least two columns')
         self.__fields.append(name)
-        self.__max_size_of_columns[0] = max(len(name), self.__max_size_of_columns[0])
+        self.__measure(0, [ name ])
 
     def add_record(self, *record):
         if len(record) != len(self.__fields):
@@ -123,22 +800,44 @@ class PrettyVTable():
             self.__groups.append([self.__fields, record, *empty_records_for_fill])
         else:
             self.__groups[-1][columnidx] = record
-        self.__max_size_of_columns[columnidx] = max(*map(len, record), self.__max_size_of_columns[columnidx])
+        self.__measure(columnidx, record)
 
-    def to_string(self):
+    def __measure(self, columnidx, cells):
+        width, plain = _measure(cells)
+        self.__max_size_of_columns[columnidx] = max(width, self.__max_size_of_columns[columnidx])
+        self.__plain_columns[columnidx] = self.__plain_columns[columnidx] and plain
+
+    # Accepts any iterable of records, a DB-API cursor or a 2-D NumPy array.
+    def add_records(self, records, chunk_rows = _default_bulk_chunk_rows):
+        for rows in _iter_record_chunks(records, chunk_rows):
+            for r in rows:
+                self.add_record(*r)
+
+    @classmethod
+    def from_columns(cls, columns, **kwargs):
+        if len(set(map(len, columns.values()))) > 1:
+            raise ValueError('columns must have the same length')
+        pt = cls(**kwargs)
+        for name in columns:
+            pt.add_field(name)
+        pt.add_records(zip(*columns.values()))
+        return pt
+
+    def iter_lines(self):
         aligned_width_of_columns = map(lambda x: align_size(x, self.__align_boundary), self.__max_size_of_columns)
         if self.__fixed_width_of_columns != None:
             aligned_width_of_columns = [ i if j == None else j for i, j in zip(aligned_width_of_columns, self.__fixed_width_of_columns) ]
-        fmtstr = self.__padding_characters.join(['{:%s%d}' % (_, __) for _, __ in zip(self.__column_alignments, aligned_width_of_columns)])
-        string = ''
-        paletteiter = iter(RingLooper(*self.__palette_paints))
-        for group in self.__groups:
-            group = transposelist(group)
-            paint = next(paletteiter)
-            for row in group:
-                string += colorize(fmtstr.format(*row), enabling = self.__enable_painting, **paint)
-                string += os.linesep
-        return string
+        layout = _make_layout(self.__padding_characters, self.__column_alignments, aligned_width_of_columns, self.__plain_columns)
+        row_formatter = _RowFormatter(layout, self.__palette_paints, self.__enable_painting)
+        for slot, group in enumerate(self.__groups):
+            for row in zip(*group):
+                yield row_formatter.line(row, slot)
+
+    def write_to(self, stream = sys.stdout, chunk_rows = _default_chunk_rows):
+        _write_lines(stream, self.iter_lines(), chunk_rows)
+
+    def to_string(self):
+        return ''.join(self.iter_lines())
 
     def __str__(self):
         return self.to_string()
@@ -267,5 +966,38 @@ def main(argv = None):
     pt.add_record('Jack', '36', '1906', 'American')
     print(pt)
 
+    print('7 ----------------------------------------------------')
+    for overflow in ( 'truncate', 'wrap', 'widen', ):
+        with LivePrettyTable(enable_painting = True if sys.stdout.isatty() else False, sample_rows = 2, overflow = overflow) as lpt:
+            lpt.add_field('Name', alignment = '>')
+            lpt.add_field('Age', alignment = '<')
+            lpt.add_field('City', alignment = '<', fixed_width = 8)
+            lpt.add_record('Zhang', '30', 'Shanghai')
+            lpt.add_record('Wang', '31', 'Beijing')
+            lpt.add_record('Christopher', '32', 'San Francisco')
+            lpt.add_record('Li', '33', 'Guangdong')
+
+    print('8 ----------------------------------------------------')
+    pt = PrettyTable(enable_painting = True if sys.stdout.isatty() else False)
+    pt.add_field('Name', alignment = '>')
+    pt.add_field('Age', alignment = '<')
+    pt.add_field('City', alignment = '<')
+    pt.add_records([ ( 'Zhang', 30, 'Shanghai' ), ( 'Wang', 31, 'Beijing' ), ( 'Li', 32, 'Shanghai' ), ( 'Christopher', 33, 'American' ) ])
+    print(pt.where(lambda r: r['City'] == 'Shanghai').sort_by('Age', reverse = True))
+    print(pt.top_k('Age', 2))
+
+    print('9 ----------------------------------------------------')
+    with LivePrettyVTable(enable_painting = True if sys.stdout.isatty() else False, sample_groups = 1, overflow = 'wrap') as lpt:
+        lpt.add_column('<')
+        lpt.add_column('>')
+        lpt.add_column('>', fixed_width = 8)
+        lpt.add_field('Name:')
+        lpt.add_field('City:')
+        lpt.add_record('Zhang', 'Shanghai')
+        lpt.add_record('Wang', 'Beijing')
+        lpt.add_record('Li', 'San Francisco')
+        lpt.add_record('Zhao', 'Shanghai')
+        lpt.add_record('Song', 'Beijing')
+
 if __name__ == '__main__':
     sys.exit(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os, sys, subprocess, tempfile, unittest
+
+# Cumulative import time budgets in microseconds, as reported by python -X importtime with the bytecode
+# already cached, best of a few runs.
+_budgets = { 'prettytable' : 15000,
+             'colored' :     10000,
+             'utils' :        3000,
+             'humanized' :    3000, }
+
+# Stdlib modules which the modules above only import when a function needing them is called.
+_deferred = ( 're', 'enum', 'json', 'csv', 'concurrent.futures', 'difflib', 'textwrap', 'urllib', )
+
+_here = os.path.dirname(os.path.abspath(__file__))
+_runs = 5
+
+class ImportTimeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.__pycache = tempfile.TemporaryDirectory()
+        cls.__env = dict(os.environ, PYTHONPYCACHEPREFIX = cls.__pycache.name)
+        cls.__env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.__pycache.cleanup()
+
+    def __python(self, *args):
+        return subprocess.run([ sys.executable, *args ], cwd = _here, env = self.__env,
+            stdout = subprocess.PIPE, stderr = subprocess.PIPE, universal_newlines = True, check = True)
+
+    def __import_time(self, module):
+        self.__python('-c', 'import %s' % module)
+        times = []
+        for _ in range(_runs):
+            for line in self.__python('-X', 'importtime', '-c', 'import %s' % module).stderr.splitlines():
+                fields = line.split('|')
+                if len(fields) == 3 and fields[2].strip() == module and fields[2].startswith(' ' + module):
+                    times.append(int(fields[1]))
+        return min(times)
+
+    def test_budgets(self):
+        for module, budget in _budgets.items():
+            with self.subTest(module = module):
+                self.assertLessEqual(self.__import_time(module), budget)
+
+    def test_deferred_imports(self):
+        for module in _budgets:
+            with self.subTest(module = module):
+                loaded = self.__python('-c', 'import sys, %s; print(*[ _ for _ in %r if _ in sys.modules ])' % (module, _deferred)).stdout.split()
+                self.assertEqual(loaded, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,7 +29,7 @@ __all__ = [
     'namedtupledictify',
 ]
 
-import math, os, sys, itertools, urllib, difflib
+import math, os, sys, itertools
 
 # Swap keys for values
 reversed_dict = lambda d: dict(zip(d.values(), d.keys()))
@@ -95,7 +95,9 @@ class RingLooper():
         else:
             raise StopIteration
 
-urlscheme = lambda url: urllib.parse.urlparse(url).scheme
+def urlscheme(url):
+    import urllib.parse
+    return urllib.parse.urlparse(url).scheme
 
 cut_integer = lambda num, bits: num & ((1<< bits) - 1)
 
@@ -113,7 +115,9 @@ isv3 = lambda : True if sys.version_info[0] == 3 else False
 >>> inversed_textwrap('1234567890', 3)
 ['1', '234', '567', '890']
 """
-inversed_textwrap = lambda text, wrapwidth: list(map(lambda x:x[::-1], textwrap.wrap(text[::-1], wrapwidth)[::-1]))
+def inversed_textwrap(text, wrapwidth):
+    import textwrap
+    return list(map(lambda x:x[::-1], textwrap.wrap(text[::-1], wrapwidth)[::-1]))
 
 # Check filestream is attached to terminal.
 streamistty = lambda file: True if file.isatty() else False
@@ -121,20 +125,22 @@ streamistty = lambda file: True if file.isatty() else False
 _DEFAULT_THRESHOLD = 0.7
 
 def fuzzy_match(needle, haystack, ignore_case = False, threshold = _DEFAULT_THRESHOLD):
+    import difflib
     if ignore_case:
         matching = lambda entry: difflib.SequenceMatcher(a = needle.lower(), b = entry.lower()).ratio() >= threshold
     else:
         matching = lambda entry: difflib.SequenceMatcher(a = needle, b = entry).ratio() >= threshold
-    return filter(match, haystack)
+    return filter(matching, haystack)
 
 def substr_match(needle, haystack, ignore_case = False):
     if ignore_case:
         matching = lambda entry: needle.lower() in entry.lower()
     else:
         matching = lambda entry: needle in entry
-    return filter(match, haystack)
+    return filter(matching, haystack)
 
 def has_fuzzy_matched(needle, haystack, ignore_case = False, threshold = _DEFAULT_THRESHOLD):
+    import difflib
     if ignore_case:
         matching = lambda entry: difflib.SequenceMatcher(a = needle.lower(), b = entry.lower()).ratio() >= threshold
     else: